@@ -15,7 +15,8 @@ from data_importer.tasks.artefact import ArtefactDatasetTask
 
 @click.command()
 @click.option('--local-scheduler', default=False, help='Whether to use the luigi local scheduler.', is_flag=True)
-def run_cron(local_scheduler):
+@click.option('--workers', default=3, help='Number of luigi workers to run tasks in parallel.')
+def run_cron(local_scheduler, workers):
     """
     Run tasks on cron - gets the current date, and runs tasks for that date
     This should be used in conjunction with a cron task, that schedules
@@ -23,14 +24,17 @@ def run_cron(local_scheduler):
     if an export is missing or corrupt (zero bytes) the tasks themselves
     will raise an error
     :param local_scheduler:
+    :param workers: number of luigi workers
     :return: None
     """
     # Get today's date, formatted as per keemu export files - 20170608
     params = {
         'date': int(time.strftime("%Y%m%d"))
     }
-    for task in [SpecimenDatasetTask, IndexLotDatasetTask, ArtefactDatasetTask]:
-        luigi.build([task(**params)], local_scheduler=local_scheduler)
+    # Schedule all the tasks together, so independent tasks (the etaxonomy
+    # and emultimedia imports) can be run in parallel
+    tasks = [task(**params) for task in [SpecimenDatasetTask, IndexLotDatasetTask, ArtefactDatasetTask]]
+    luigi.build(tasks, workers=workers, local_scheduler=local_scheduler)
 
 
 if __name__ == "__main__":
@@ -15,7 +15,7 @@ from data_importer.lib.dataset import dataset_get_tasks
 from data_importer.tasks.keemu.ecatalogue import EcatalogueTask
 from data_importer.tasks.keemu.emultimedia import EMultimediaTask
 from data_importer.tasks.keemu.etaxonomy import ETaxonomyTask
-from data_importer.lib.db import db_drop_table
+from data_importer.lib.db import db_drop_tables
 from data_importer.lib.dataset import dataset_get_foreign_keys
 
 
@@ -38,15 +38,12 @@ def drop_tables():
     )
 
     if yesno('Your are dropping all tables - all data will be deleted. Are you sure you want to continue?'):
-        db_drop_table('table_updates', connection)
+        table_names = ['table_updates']
         # Delete all info in the module tables
-        for task in [EcatalogueTask, ETaxonomyTask, EMultimediaTask]:
-            db_drop_table(task.module_name, connection)
-
-        for foreign_key in dataset_get_foreign_keys():
-            db_drop_table(foreign_key.table, connection)
-
-        connection.commit()
+        table_names += [task.module_name for task in [EcatalogueTask, ETaxonomyTask, EMultimediaTask]]
+        table_names += [foreign_key.table for foreign_key in dataset_get_foreign_keys()]
+        # Drop all the tables in one statement
+        db_drop_tables(table_names, connection)
         connection.close()
 
 if __name__ == "__main__":
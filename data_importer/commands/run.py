@@ -19,15 +19,19 @@ from data_importer.tasks.artefact import ArtefactDatasetTask
 @click.command()
 @click.argument('date')
 @click.option('--local-scheduler', default=False, help='Whether to use the luigi local scheduler.', is_flag=True)
-def run_cron(date, local_scheduler):
+@click.option('--workers', default=3, help='Number of luigi workers to run tasks in parallel.')
+def run_cron(date, local_scheduler, workers):
     """
     Helper command to run all three dataset tasks
     :param date: data of import to run.
     :param local_scheduler:
+    :param workers: number of luigi workers
     :return: None
     """
-    for task in [SpecimenDatasetTask, IndexLotDatasetTask, ArtefactDatasetTask]:
-        luigi.build([task(date=int(date))], local_scheduler=local_scheduler)
+    # Schedule all the tasks together, so independent tasks (the etaxonomy
+    # and emultimedia imports) can be run in parallel
+    tasks = [task(date=int(date)) for task in [SpecimenDatasetTask, IndexLotDatasetTask, ArtefactDatasetTask]]
+    luigi.build(tasks, workers=workers, local_scheduler=local_scheduler)
 
 
 if __name__ == "__main__":
@@ -4,6 +4,8 @@
 Created by Ben Scott on '31/08/2017'.
 """
 
+from functools import lru_cache
+
 
 def dataset_get_tasks():
     from data_importer.tasks.indexlot import IndexLotDatasetTask
@@ -12,23 +14,27 @@ def dataset_get_tasks():
     return [SpecimenDatasetTask, IndexLotDatasetTask, ArtefactDatasetTask]
 
 
+@lru_cache(maxsize=None)
 def dataset_get_properties(module_name):
     """
     Loop through all of the datasets, and extract all the of property fields
     For a particular module name
+    Cached, as this is called whenever a module task is instantiated
     @param module_name:
-    @return: list of properties
+    @return: tuple of properties
     """
     record_properties = []
     for dataset_task in dataset_get_tasks():
         record_properties += [f for f in dataset_task.fields if f.module_name == module_name]
-    return record_properties
+    return tuple(record_properties)
 
 
+@lru_cache(maxsize=None)
 def dataset_get_foreign_keys(module_name=None):
     """
     Build a list of all foreign key fields
-    :return:
+    Cached, as this is called whenever a module task is instantiated
+    :return: frozenset of foreign keys
     """
     foreign_keys = set()
     for dataset_task in dataset_get_tasks():
@@ -37,4 +43,4 @@ def dataset_get_foreign_keys(module_name=None):
                 foreign_keys.add(foreign_key)
             elif foreign_key.module_name == module_name:
                 foreign_keys.add(foreign_key)
-    return foreign_keys
\ No newline at end of file
+    return frozenset(foreign_keys)
\ No newline at end of file
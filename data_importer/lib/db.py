@@ -4,6 +4,18 @@
 Created by Ben Scott on '21/03/2017'.
 """
 
+from functools import lru_cache
+from psycopg2 import sql
+
+# SQL statements are parsed once here, and composed with the (quoted)
+# table names when they are used
+DROP_VIEW_SQL = sql.SQL('DROP MATERIALIZED VIEW IF EXISTS {view} CASCADE')
+CREATE_INDEX_SQL = sql.SQL('CREATE INDEX IF NOT EXISTS {index_name} ON {table} USING {index_type} ({field_name})')
+DROP_TABLE_SQL = sql.SQL('DROP TABLE IF EXISTS {tables} CASCADE')
+TABLE_HAS_RECORDS_SQL = sql.SQL('SELECT SIGN(COUNT(*)) FROM {table} LIMIT 1')
+DELETE_RECORD_SQL = sql.SQL('UPDATE {table} SET (deleted) = (NOW()) WHERE {table}.irn = %s')
+DELETE_RECORDS_SQL = sql.SQL('UPDATE {table} SET deleted = NOW() WHERE {table}.irn = ANY(%s)')
+
 
 def db_view_exists(view_name, connection):
     cursor = connection.cursor()
@@ -18,17 +30,43 @@ def db_drop_view(view_name, connection):
     :param connection:
     :return:
     """
-    query = 'DROP MATERIALIZED VIEW IF EXISTS "{view_name}" CASCADE'.format(view_name=view_name)
+    query = DROP_VIEW_SQL.format(view=sql.Identifier(view_name))
     connection.cursor().execute(query)
     connection.commit()
 
 
+def db_index_name(table_name, field_name):
+    """
+    Name of the index created on a field by db_create_index()
+    :param table_name:
+    :param field_name:
+    :return: string
+    """
+    return '{}_{}_idx'.format(table_name, field_name)
+
+
+def db_get_index_names(table_name, connection):
+    """
+    Get the names of the indexes on a table in the current schema
+    :param table_name:
+    :param connection:
+    :return: set of index names
+    """
+    cursor = connection.cursor()
+    cursor.execute(
+        "SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s",
+        (table_name,)
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+
 def db_create_index(table_name, field_name, index_type, connection):
     cursor = connection.cursor()
-    query = "CREATE INDEX IF NOT EXISTS {table}_{field_name}_idx ON {table} USING {index_type} ({field_name})".format(
-        table=table_name,
-        index_type=index_type,
-        field_name=field_name
+    query = CREATE_INDEX_SQL.format(
+        index_name=sql.Identifier(db_index_name(table_name, field_name)),
+        table=sql.Identifier(table_name),
+        index_type=sql.SQL(index_type),
+        field_name=sql.Identifier(field_name)
     )
     cursor.execute(query)
 
@@ -45,6 +83,24 @@ def db_table_exists(table_name, connection):
     return cursor.fetchone()[0]
 
 
+def db_table_estimated_count(table_name, connection):
+    """
+    Get the planner's estimate of the number of rows in a table
+    Much cheaper than a COUNT(*) on a large table
+    :param table_name:
+    :param connection:
+    :return: int
+    """
+    cursor = connection.cursor()
+    cursor.execute(
+        "SELECT c.reltuples FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE n.nspname = current_schema() AND c.relname = %s AND c.relkind = 'r'",
+        (table_name,)
+    )
+    row = cursor.fetchone()
+    return max(int(row[0]), 0) if row else 0
+
+
 def db_drop_table(table_name, connection):
     """
     Drop the table
@@ -52,11 +108,31 @@ def db_drop_table(table_name, connection):
     :param connection:
     :return:
     """
-    query = "DROP TABLE IF EXISTS {table} CASCADE".format(table=table_name)
+    query = DROP_TABLE_SQL.format(tables=sql.Identifier(table_name))
     connection.cursor().execute(query)
     connection.commit()
 
 
+def db_drop_tables(table_names, connection):
+    """
+    Drop multiple tables in a single statement
+    Only the tables which exist are dropped - many will already have been
+    dropped by the CASCADE
+    :param table_names: list of table names
+    :param connection:
+    :return:
+    """
+    cursor = connection.cursor()
+    cursor.execute(
+        "SELECT tablename FROM pg_tables WHERE schemaname = ANY(current_schemas(false)) AND tablename = ANY(%s)",
+        (list(set(table_names)),)
+    )
+    existing_table_names = [row[0] for row in cursor.fetchall()]
+    if existing_table_names:
+        cursor.execute(DROP_TABLE_SQL.format(tables=sql.SQL(', ').join(map(sql.Identifier, existing_table_names))))
+    connection.commit()
+
+
 def db_table_has_records(table_name, connection):
     """
     Drop the table
@@ -66,15 +142,20 @@ def db_table_has_records(table_name, connection):
     """
     if db_table_exists(table_name, connection):
         cursor = connection.cursor()
-        cursor.execute("""
-          SELECT SIGN(COUNT(*))
-          FROM {table} LIMIT 1
-          """.format(table=table_name)
-        )
+        cursor.execute(TABLE_HAS_RECORDS_SQL.format(table=sql.Identifier(table_name)))
         return bool(cursor.fetchone()[0])
     return False
 
 
+@lru_cache(maxsize=None)
+def _db_delete_record_sql(table_name):
+    """
+    Delete record SQL composed for a table - cached as it's used for every
+    record in the eaudit export
+    """
+    return DELETE_RECORD_SQL.format(table=sql.Identifier(table_name))
+
+
 def db_delete_record(table_name, irn, cursor):
     """
     Mark a record as deleted
@@ -83,7 +164,16 @@ def db_delete_record(table_name, irn, cursor):
     :param cursor:
     :return:
     """
-    sql = "UPDATE {table_name} SET (deleted) = (NOW()) WHERE {table_name}.irn = %s".format(
-        table_name=table_name,
-    )
-    cursor.execute(sql, (irn,))
+    cursor.execute(_db_delete_record_sql(table_name), (irn,))
+
+
+def db_delete_records(table_name, irns, cursor):
+    """
+    Mark multiple records as deleted
+    :param table_name
+    :param irns: list of record irns
+    :param cursor:
+    :return:
+    """
+    query = DELETE_RECORDS_SQL.format(table=sql.Identifier(table_name))
+    cursor.execute(query, ([int(irn) for irn in irns],))
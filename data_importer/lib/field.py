@@ -31,7 +31,14 @@ class Field(object):
         return None
 
     def get_value(self, record):
-        v = self._get_value(record)
+        return self.format_value(self._get_value(record))
+
+    def format_value(self, v):
+        """
+        Apply the formatter, and remove whitespace from string values
+        @param v:
+        @return:
+        """
         if self.formatter:
             v = self.formatter(v)
         if v and isinstance(v, str):
@@ -9,25 +9,44 @@ class Filter(object):
     """
     Field definition
     :param field_name: keemu field name
-    :param filters: List of filters to apply
+    :param filters: List of filters to apply - either (operator, value)
+    pairs, or single argument functions
     """
     def __init__(self, field_name, filters):
         self.field_name = field_name
         self.filters = filters
+        self._predicates = self._build_predicates()
 
-    def apply(self, record):
-        value = getattr(record, self.field_name, None)
+    def _build_predicates(self):
+        """
+        Flatten the filters into a list of (field name, operator, value) tuples
+        Filters which are just a function are wrapped so all predicates can be
+        called in the same way - operator(record value, filter value)
+        :return: list
+        """
+        predicates = []
         for f in self.filters:
             # Some filters have a value for comparison; others are just a function
-            try:
+            if isinstance(f, (tuple, list)):
                 filter_operator, filter_value = f
-                ret = filter_operator(value, filter_value)
-            except TypeError:
-                ret = f(value)
+            else:
+                filter_operator, filter_value = (lambda value, _, func=f: func(value)), None
+            predicates.append((self.field_name, filter_operator, filter_value))
+        return predicates
 
-            if not ret:
-                return False
+    def predicates(self):
+        """
+        The filters as (field name, operator, value) tuples - built once
+        when the filter is created
+        :return: list
+        """
+        return self._predicates
 
+    def apply(self, record):
+        value = getattr(record, self.field_name, None)
+        for _, filter_operator, filter_value in self._predicates:
+            if not filter_operator(value, filter_value):
+                return False
         return True
 
     def __str__(self):
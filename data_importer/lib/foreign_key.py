@@ -5,6 +5,7 @@ Created by Ben Scott on '12/09/2017'.
 """
 
 import psycopg2
+from psycopg2 import sql
 from data_importer.lib.db import db_table_exists
 
 
@@ -33,63 +34,89 @@ class ForeignKeyField(object):
         return '_{}__{}'.format(self.module_name, self.join_module)
 
     @property
-    def insert_sql(self):
+    def staging_column(self):
         """
-        SQL for inserting
-        Uses SELECT...WHERE EXISTS to ensure the IRN exists in the join table
+        Name of the staging table column holding the related IRNs - more than
+        one foreign key can share a table, so this is named by the KE EMu field
+        :return: string
+        """
+        return self.field_name
+
+    def insert_sql(self, staging_table):
+        """
+        SQL for inserting all relationships held in the staging table
+        Only the last copy of a record repeated in the export is used, as
+        with the module table upsert
+        Uses WHERE EXISTS to ensure the IRN exists in the join table
         If there's a conflict on irn/rel_irn, do not insert
         """
-        sql = """
+        query = sql.SQL("""
           INSERT INTO {table_name}(irn, rel_irn)
-          SELECT %(irn)s, %(rel_irn)s
-            WHERE EXISTS(SELECT 1 FROM {join_module} where irn=%(rel_irn)s)
+          SELECT staging.irn, staging.rel_irn
+            FROM (
+              SELECT irn, UNNEST(latest.{staging_column}) AS rel_irn FROM (
+                SELECT DISTINCT ON (irn) irn, {staging_column} FROM {staging_table} ORDER BY irn, ctid DESC
+              ) AS latest
+            ) AS staging
+            WHERE EXISTS(SELECT 1 FROM {join_module} where irn=staging.rel_irn)
           ON CONFLICT (irn, rel_irn) DO NOTHING;
-        """.format(
-            table_name=self.table,
-            join_module=self.join_module
+        """).format(
+            table_name=sql.Identifier(self.table),
+            staging_table=sql.Identifier(staging_table),
+            staging_column=sql.Identifier(self.staging_column),
+            join_module=sql.Identifier(self.join_module)
         )
-        return sql
+        return query
 
-    @property
-    def delete_sql(self):
-        sql = """
-            DELETE FROM {table_name} WHERE irn = %(irn)s
-        """.format(
-            table_name=self.table,
+    def delete_sql(self, staging_table):
+        query = sql.SQL("""
+            DELETE FROM {table_name} WHERE irn IN (SELECT irn FROM {staging_table})
+        """).format(
+            table_name=sql.Identifier(self.table),
+            staging_table=sql.Identifier(staging_table),
         )
-        return sql
+        return query
 
     def create_table(self, connection):
         if not db_table_exists(self.table, connection):
-            query = """
+            query = sql.SQL("""
               CREATE TABLE {table} (
                 irn int references {module_name}(irn),
                 rel_irn int references {join_module}(irn)
               )
-            """.format(
-                table=self.table,
-                module_name=self.module_name,
-                join_module=self.join_module
+            """).format(
+                table=sql.Identifier(self.table),
+                module_name=sql.Identifier(self.module_name),
+                join_module=sql.Identifier(self.join_module)
             )
             connection.cursor().execute(query)
             # Create indexes - postgres does not index reference fields
-            query = """
+            query = sql.SQL("""
               CREATE UNIQUE INDEX ON {table} (irn, rel_irn)
-            """.format(
-                table=self.table,
+            """).format(
+                table=sql.Identifier(self.table),
             )
             connection.cursor().execute(query)
 
-    def delete(self, cursor, record):
-        cursor.execute(self.delete_sql, {'irn': record.irn})
+    def get_rel_irns(self, record):
+        """
+        Get a list of the related IRNs for a record
+        We can get a single IRN or a list, so always convert to list
+        Also, ensure all are integers
+        :param record:
+        :return: list of IRNs or None if there's no relationship
+        """
+        rel_irn = getattr(record, self.field_name, None)
+        if not rel_irn:
+            return None
+        return [int(rel_irn)] if not isinstance(rel_irn, list) else [int(irn) for irn in rel_irn]
 
-    def insert(self, cursor, record, rel_irn):
+    def delete(self, cursor, staging_table):
+        """
+        Delete all existing relationships for records in the staging table
+        Prevents relationships data from getting stale
+        """
+        cursor.execute(self.delete_sql(staging_table))
 
-        # We can get a list of IRNs, so convert to list so we can easily loop
-        # Also, ensure all are integers
-        irn_list = [int(rel_irn)] if not isinstance(rel_irn, list) else map(int, rel_irn)
-        for irn in irn_list:
-            cursor.execute(self.insert_sql, {
-                'irn': record.irn,
-                'rel_irn': irn
-            })
+    def insert(self, cursor, staging_table):
+        cursor.execute(self.insert_sql(staging_table))
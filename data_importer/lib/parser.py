@@ -4,31 +4,50 @@
 Created by Ben Scott on '25/02/2017'.
 """
 
+import io
 import re
 import gzip
-from data_importer.lib.record import Record
+from data_importer.lib.record import Record, record_class
+
+# Size of the read buffer for the export file - the file is only ever read
+# through this buffer, so memory use is flat whatever the size of the export
+BUFFER_SIZE = 1 << 16
+
+# Multi-value fields have an index suffix - MulMultiMediaRef:1
+RE_FIELD_NAME_INDEX = re.compile(':[0-9]*')
 
 
 class Parser(object):
     """
     Iterator for parsing a KE EMu export file
     Yields record objects
+    :param path: path to the export file
+    :param field_names: optional list of KE EMu fields to parse - if set,
+    all other fields are skipped, and records use __slots__ for the fields
     """
-    def __init__(self, path):
+    def __init__(self, path, field_names=None):
         self.path = path
-        self.export_file = gzip.open(self.path, 'rt')
-        self.re_field_name_index = re.compile(':([0-9]?)+')
+        if field_names:
+            self.field_names = frozenset(field_names)
+            self.record_class = record_class(tuple(sorted(self.field_names)))
+        else:
+            self.field_names = None
+            self.record_class = Record
+        self.export_file = io.TextIOWrapper(
+            io.BufferedReader(gzip.GzipFile(self.path, 'rb'), buffer_size=BUFFER_SIZE)
+        )
+        self._records = self._parse()
 
     def __iter__(self):
         return self
 
     def next(self):
-        for record in self._parse():
-            return record
-        raise StopIteration()
+        return next(self._records)
 
     def _parse(self):
-        record = Record()
+        field_names = self.field_names
+        record_class = self.record_class
+        record = record_class()
         for line in self.export_file:
             line = line.strip()
             if not line:
@@ -36,12 +55,24 @@ class Parser(object):
             # If is a line separator, write the record
             if line == '###':
                 yield record
-                record = Record()
+                record = record_class()
             else:
                 field_name, value = line.split('=', 1)
                 # Replace field name indexes
-                field_name = self.re_field_name_index.sub('', field_name)
+                if ':' in field_name:
+                    field_name = RE_FIELD_NAME_INDEX.sub('', field_name)
+                # Skip any fields we're not using
+                if field_names is not None and field_name not in field_names:
+                    continue
                 setattr(record, field_name, value)
+        self.close()
+
+    def close(self):
+        """
+        Close the export file - called once all records have been parsed,
+        or can be called to stop parsing early
+        """
+        self.export_file.close()
 
     # Python 3.X Compatibility
     __next__ = next
@@ -4,11 +4,39 @@
 Created by Ben Scott on '14/02/2017'.
 """
 
+from functools import lru_cache
+from operator import attrgetter
+
+
+def record_values_getter(field_names):
+    """
+    Build a function which returns a tuple of the values for all field_names
+    from a record, fetched with a single attrgetter call
+    attrgetter only returns a tuple for more than one field name, so the
+    zero and one field cases are handled here too
+    :param field_names: list of KE EMu field names
+    :return: function
+    """
+    if not field_names:
+        return lambda record: ()
+    if len(field_names) == 1:
+        getter = attrgetter(field_names[0])
+        return lambda record: (getter(record),)
+    return attrgetter(*field_names)
+
 
 class Record(object):
     """
     Object with setter overridden so multi-value fields are turned into an array
+    Fields not present in the record are None
     """
+    def __getattr__(self, key):
+        # Only called if the attribute isn't set - private & special attributes
+        # still raise an error so copy, pickle etc., work as normal
+        if key.startswith('_'):
+            raise AttributeError(key)
+        return None
+
     def __setattr__(self, key, value):
         if value:
             if key in self.__dict__:
@@ -22,3 +50,39 @@ class Record(object):
         # if key in ['NhmSecEmbargoDate', 'NhmSecEmbargoExtensionDate']:
         #     print(key)
         #     print(value)
+
+
+class SlotsRecord(object):
+    """
+    Record with a fixed set of fields, stored in __slots__ rather than a
+    per-record dict - use record_class() to build the class for a set of fields
+    Multi-value fields are turned into an array, as with Record
+    Fields not present in the record are None
+    """
+    __slots__ = ()
+
+    def __getattr__(self, key):
+        # Only called if the slot isn't set
+        if key.startswith('_'):
+            raise AttributeError(key)
+        return None
+
+    def __setattr__(self, key, value):
+        if value:
+            current = getattr(self, key)
+            if current is None:
+                object.__setattr__(self, key, value)
+            elif isinstance(current, list):
+                current.append(value)
+            else:
+                object.__setattr__(self, key, [current, value])
+
+
+@lru_cache(maxsize=None)
+def record_class(field_names):
+    """
+    Build a SlotsRecord class with a slot for each of the field names
+    :param field_names: tuple of KE EMu field names
+    :return: class
+    """
+    return type('SlotsRecord', (SlotsRecord,), {'__slots__': field_names})
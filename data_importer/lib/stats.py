@@ -8,14 +8,23 @@ import requests
 from data_importer.lib.config import Config, configparser
 
 
-def get_milestones(cursor):
-    return [
-        SpecimenMilestone(cursor)
+def get_milestones(cursor, module_name=None):
+    """
+    Get the milestones, optionally only those counting records in a module
+    :param cursor: a cursor connected to the database
+    :param module_name: optional KE EMu module name
+    :return: list of milestones
+    """
+    milestone_classes = [
+        SpecimenMilestone
         ]
+    return [m(cursor) for m in milestone_classes if module_name is None or m.module_name == module_name]
 
 
 class BaseMilestone(object):
     name = ''
+    # The KE EMu module whose records are counted
+    module_name = None
 
     try:
         log = Config.get('milestones', 'log')
@@ -164,6 +173,7 @@ class BaseMilestone(object):
 
 class SpecimenMilestone(BaseMilestone):
     name = 'specimens'
+    module_name = 'ecatalogue'
 
     def __init__(self, *args, **kwargs):
         from data_importer.tasks import specimen_record_types
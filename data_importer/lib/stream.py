@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import io
+import queue
+import threading
+import orjson
+
+# Characters which need escaping in the Postgres COPY TEXT format
+COPY_ESCAPES = str.maketrans({
+    '\\': '\\\\',
+    '\t': '\\t',
+    '\n': '\\n',
+    '\r': '\\r',
+})
+
+# Size of the chunks read from a CopyStream by copy_expert - larger than
+# psycopg2's 8KB default, so fewer read calls and CopyData messages are needed
+COPY_BUFFER_SIZE = 1 << 16
+
+# COPY TEXT format representation of NULL
+COPY_NULL = b'\\N'
+
+
+def copy_format_array(values):
+    """
+    Format a list as a postgres array literal - {"a","b"}
+    :param values: list
+    :return: string
+    """
+    elements = []
+    for v in values:
+        if v is None:
+            elements.append('NULL')
+        else:
+            elements.append('"{}"'.format(str(v).replace('\\', '\\\\').replace('"', '\\"')))
+    return '{' + ','.join(elements) + '}'
+
+
+def copy_format_value(value):
+    """
+    Format a single value for the COPY TEXT format
+    :param value:
+    :return: bytes
+    """
+    if value is None:
+        return COPY_NULL
+    if isinstance(value, dict):
+        # orjson produces bytes directly, and escapes all control characters
+        # so only the backslashes need escaping for COPY
+        return orjson.dumps(value).replace(b'\\', b'\\\\')
+    if isinstance(value, bool):
+        value = 't' if value else 'f'
+    elif isinstance(value, (list, tuple)):
+        value = copy_format_array(value)
+    else:
+        value = str(value)
+    return value.translate(COPY_ESCAPES).encode('utf-8')
+
+
+def copy_format_row(row):
+    """
+    Format a row (sequence of values) as a line of COPY TEXT format
+    :param row:
+    :return: bytes
+    """
+    return b'\t'.join(map(copy_format_value, row)) + b'\n'
+
+
+class CopyStream(io.RawIOBase):
+    """
+    Read only file-like object, wrapping an iterator of rows
+    Rows are only pulled from the iterator as data is read, so they can
+    be streamed into cursor.copy_expert() without building the whole file
+    :param rows: iterator of rows
+    """
+    def __init__(self, rows):
+        super(CopyStream, self).__init__()
+        self.rows = iter(rows)
+        self._buffer = bytearray()
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size is None or size < 0 or len(self._buffer) < size:
+            try:
+                row = next(self.rows)
+            except StopIteration:
+                break
+            self._buffer += copy_format_row(row)
+
+        if size is None or size < 0:
+            size = len(self._buffer)
+        chunk = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return chunk
+
+
+class BackgroundIterator(object):
+    """
+    Iterator which consumes another iterator in a background thread
+    Items are passed back in batches through a bounded queue, so the source
+    (reading and parsing the export) can run while the consumer is busy
+    (sending data to postgres), without holding more than
+    maxsize * batch_size items in memory
+    :param iterable: the source iterator
+    :param batch_size: number of items passed through the queue at a time
+    :param maxsize: maximum number of batches waiting in the queue
+    """
+    # Seconds the producer waits on a full queue before re-checking if it
+    # has been stopped
+    put_timeout = 0.1
+
+    def __init__(self, iterable, batch_size=100, maxsize=10):
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize)
+        self.error = None
+        self._batch = iter(())
+        self._finished = False
+        self._stopped = threading.Event()
+        self.thread = threading.Thread(target=self._produce, args=(iterable,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _put(self, batch):
+        """
+        Put a batch on the queue, waiting while it is full unless the
+        iterator has been stopped
+        :return: False if the iterator was stopped before the batch was queued
+        """
+        while not self._stopped.is_set():
+            try:
+                self.queue.put(batch, timeout=self.put_timeout)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, iterable):
+        batch = []
+        try:
+            for item in iterable:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    if not self._put(batch):
+                        break
+                    batch = []
+        except Exception as e:
+            # Store the error, so it can be raised in the consuming thread
+            self.error = e
+        finally:
+            # Close the source (if it's a generator) so any files it has
+            # open are closed, even if the consumer has stopped early
+            close = getattr(iterable, 'close', None)
+            if close:
+                close()
+        if batch and not self._put(batch):
+            return
+        # An empty batch signals the end of the iterator
+        self._put([])
+
+    def stop(self):
+        """
+        Stop the producer thread, and wait for it to finish - the source
+        iterator is closed by the producer thread
+        """
+        self._stopped.set()
+        self.thread.join()
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        for item in self._batch:
+            return item
+        # The producer has exited, so nothing more will be put on the queue -
+        # copy_expert keeps reading until it gets no data, so this must not block
+        if self._finished:
+            raise StopIteration()
+        batch = self.queue.get()
+        if not batch:
+            self._finished = True
+            self.thread.join()
+            if self.error:
+                raise self.error
+            raise StopIteration()
+        self._batch = iter(batch)
+        return next(self._batch)
+
+    # Python 3.X Compatibility
+    __next__ = next
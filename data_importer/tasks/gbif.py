@@ -104,7 +104,8 @@ class GBIFTask(CopyToTable):
 
     def ensure_indexes(self):
         connection = self.output().connect()
-        db_create_index(self.table, 'occurrenceID', 'btree', connection)
+        # Column names aren't quoted when the table is created, so are lower case
+        db_create_index(self.table, 'occurrenceid', 'btree', connection)
         connection.commit()
 
 
@@ -9,15 +9,26 @@ import logging
 from psycopg2.extras import Json as PGJson
 import luigi
 import time
+from psycopg2 import sql
+from concurrent.futures import ThreadPoolExecutor
 from operator import is_not
 from luigi.contrib.postgres import CopyToTable as LuigiCopyToTable
-from data_importer.lib.db import db_table_exists, db_delete_record, db_create_index
+from data_importer.lib.db import (
+    db_create_index,
+    db_delete_records,
+    db_get_index_names,
+    db_index_name,
+    db_table_estimated_count,
+    db_table_exists
+)
 from data_importer.lib.operators import is_not_one_of, is_uuid
 from data_importer.tasks.file.keemu import KeemuFileTask
 from data_importer.lib.parser import Parser
-from data_importer.lib.config import Config
+from data_importer.lib.record import record_values_getter
+from data_importer.lib.config import Config, configparser
 from data_importer.lib.column import Column
 from data_importer.lib.filter import Filter
+from data_importer.lib.stream import CopyStream, BackgroundIterator, COPY_BUFFER_SIZE
 
 from data_importer.lib.dataset import (
     dataset_get_foreign_keys,
@@ -30,10 +41,14 @@ from data_importer.lib.stats import (
 
 logger = logging.getLogger('luigi-interface')
 
+# Number of rows fetched at a time by the milestone checks' server side cursor
+MILESTONE_ITERSIZE = 2000
+
 
 class KeemuBaseTask(LuigiCopyToTable):
     """
-    Extends CopyToTable to write directly to database using Upsert statements
+    Extends CopyToTable to write to the database - records are streamed into
+    a temporary staging table with COPY, and then upserted into the module table
     """
     # Task parameters
     date = luigi.IntParameter()
@@ -77,6 +92,26 @@ class KeemuBaseTask(LuigiCopyToTable):
     user = Config.get('database', 'username')
     password = Config.get('database', 'password')
 
+    # Session settings for building indexes - see ensure_indexes()
+    try:
+        maintenance_work_mem = Config.get('database', 'maintenance_work_mem')
+    except configparser.NoOptionError:
+        maintenance_work_mem = '1GB'
+    try:
+        max_parallel_maintenance_workers = Config.getint('database', 'max_parallel_maintenance_workers')
+    except configparser.NoOptionError:
+        max_parallel_maintenance_workers = 4
+    # Maximum number of indexes built at the same time
+    try:
+        index_workers = Config.getint('database', 'index_workers')
+    except configparser.NoOptionError:
+        index_workers = 2
+
+    # If the number of records being imported is more than this proportion of
+    # the table, the indexes are dropped before the upsert and rebuilt after,
+    # before the import is committed
+    rebuild_indexes_ratio = 0.5
+
     @property
     def table(self):
         """
@@ -85,22 +120,84 @@ class KeemuBaseTask(LuigiCopyToTable):
         """
         return self.module_name
 
-    # Count total number of records (including skipped)
-    record_count = 0
-    # Count of records inserted / written to CSV
-    insert_count = 0
+    def __init_subclass__(cls, **kwargs):
+        """
+        Build the column metadata once for each module task class - it only
+        depends on the class columns, so is the same for every task instance
+        """
+        super(KeemuBaseTask, cls).__init_subclass__(**kwargs)
+        # Build the list of fields populated from the record dict, adding any
+        # extra fields defined in the module class
+        cls._insert_fields = ['irn', 'guid', 'properties', 'import_date']
+        for col in cls.columns:
+            if col not in KeemuBaseTask.columns and col.field_name not in cls._insert_fields:
+                cls._insert_fields.append(col.field_name)
+        # The fields returned to the milestone checks - dates are formatted as
+        # they are in the export, so milestones see the same values as before
+        column_types = {col.field_name: col.field_type for col in cls.columns}
+        cls._returned_fields = [
+            sql.SQL("to_char({0}, 'YYYYMMDD') AS {0}").format(sql.Identifier(f))
+            if column_types.get(f) == 'DATE' else sql.Identifier(f)
+            for f in cls._insert_fields
+        ]
+        # And a list of (field name, index type) for all the indexed columns
+        cls._indexes = [(col.field_name, col.get_index_type()) for col in cls.columns if col.indexed]
+        # Build a list of (field name, start, end, formatter) for all the
+        # columns populated from the record, where start & end are the slice
+        # of the column's KE EMu field names in the values fetched by
+        # cls._column_values - so the values are all fetched in a single call
+        column_field_names = []
+        cls._column_getters = []
+        for col in cls.columns:
+            if col.ke_field_name:
+                ke_field_names = col.ke_field_name if isinstance(col.ke_field_name, list) else [col.ke_field_name]
+                start = len(column_field_names)
+                column_field_names += ke_field_names
+                cls._column_getters.append((col.field_name, start, len(column_field_names), col.formatter))
+        cls._column_values = staticmethod(record_values_getter(column_field_names))
+        cls._column_field_names = column_field_names
 
     def __init__(self, *args, **kwargs):
-        # Initiate a DB connection
         super(KeemuBaseTask, self).__init__(*args, **kwargs)
-        self.connection = self.output().connect()
-        self.cursor = self.connection.cursor()
+        # Count total number of records (including skipped)
+        self.record_count = 0
+        # Count of records inserted
+        self.insert_count = 0
+        # The DB connection is opened in run(), so tasks running in parallel
+        # worker processes never share a connection
+        self.connection = None
+        self.cursor = None
+        self.milestones = []
         # Build a list of properties from the dataset fields
         self.record_properties = dataset_get_properties(self.module_name)
         # Get all foreign keys
-        self.foreign_keys = dataset_get_foreign_keys(self.module_name)
-        # Get current specimen record count
-        self.milestones = get_milestones(self.cursor)
+        self.foreign_keys = list(dataset_get_foreign_keys(self.module_name))
+        # Foreign keys grouped by relationship table - more than one foreign
+        # key can write to the same table
+        self._foreign_key_tables = {}
+        for fk in self.foreign_keys:
+            self._foreign_key_tables.setdefault(fk.table, []).append(fk)
+        # IRNs of records marked as not web publishable, to be deleted
+        self.unpublished_irns = []
+        # Flatten the record filters into a single chain of predicates, so
+        # they're only built once rather than for every record
+        self._filter_chain = [p for f in self.record_filters for p in f.predicates()]
+        # Build a list of (field, start, end) for the properties, fetched in a
+        # single call in the same way as the columns' values
+        property_field_names = []
+        self._property_getters = []
+        for field in self.record_properties:
+            start = len(property_field_names)
+            property_field_names += field.field_name
+            self._property_getters.append((field, start, len(property_field_names)))
+        self._property_values = record_values_getter(property_field_names)
+        # All the KE EMu fields used by this task - only these fields are
+        # parsed from the export
+        self._record_field_names = set(['irn', 'AdmGUIDPreferredValue', 'AdmPublishWebNoPasswordFlag'])
+        self._record_field_names.update(field_name for field_name, _, _ in self._filter_chain)
+        self._record_field_names.update(self._column_field_names)
+        self._record_field_names.update(property_field_names)
+        self._record_field_names.update(fk.field_name for fk in self.foreign_keys)
 
     def create_table(self, connection):
         """
@@ -109,38 +206,172 @@ class KeemuBaseTask(LuigiCopyToTable):
         Column objects, not tuples
         """
 
-        # Build a string of column definitions
-        coldefs = ','.join(
-            '{name} {type}'.format(name=col.field_name, type=col.field_type) for col in self.columns
+        # Build the column definitions
+        coldefs = sql.SQL(',').join(
+            sql.SQL('{name} {type}').format(name=sql.Identifier(col.field_name), type=sql.SQL(col.field_type))
+            for col in self.columns
         )
-        query = "CREATE TABLE {table} ({coldefs})".format(table=self.table, coldefs=coldefs)
+        query = sql.SQL("CREATE TABLE {table} ({coldefs})").format(table=sql.Identifier(self.table), coldefs=coldefs)
         connection.cursor().execute(query)
         connection.commit()
 
+    @property
+    def staging_table(self):
+        """
+        Name of the temporary table records are copied into before upsert
+        :return: string
+        """
+        return '{}_staging'.format(self.table)
+
+    @property
+    def insert_fields(self):
+        """
+        List of fields populated from the record dict, in the order they
+        are written to the staging table
+        :return: list
+        """
+        return self._insert_fields
+
+    @property
+    def returned_fields(self):
+        """
+        SQL select list of the insert fields, as passed to the milestone checks
+        :return: SQL
+        """
+        return sql.SQL(',').join(self._returned_fields)
+
+    @property
+    def inserted_table(self):
+        """
+        Name of the temporary table holding the IRNs of newly inserted records
+        :return: string
+        """
+        return '{}_inserted'.format(self.table)
+
     @property
     def sql(self):
         """
-        SQL for insert / updates
+        SQL for insert / updates from the staging table
         Tries inserting, and on conflict performs update with modified date
         :return: SQL
         """
-        # Get any extra fields defined in the base module class
-        # This uses a set comprehension converted into a list for deduping
-        extra_fields = list({col.field_name for col in self.columns if col not in KeemuBaseTask.columns})
-        insert_fields = ['irn', 'guid', 'properties', 'import_date'] + extra_fields
-        update_fields = ['properties', 'import_date'] + extra_fields
-        sql = """
-            INSERT INTO {table_name} ({insert_fields}, created) VALUES ({insert_fields_placeholders}, NOW())
+        insert_fields = sql.SQL(',').join(map(sql.Identifier, self.insert_fields))
+        update_fields = [f for f in self.insert_fields if f not in ('irn', 'guid')]
+        # If a record appears more than once in the export, the last one wins.
+        # The staging table is only ever appended to, so ctid follows COPY order
+        query = sql.SQL("""
+            INSERT INTO {table_name} ({insert_fields}, created)
+            SELECT DISTINCT ON (irn) {insert_fields}, NOW() FROM {staging_table} ORDER BY irn, ctid DESC
             ON CONFLICT (irn)
-            DO UPDATE SET ({update_fields}, modified) = ({update_fields_placeholders}, NOW()) WHERE {table_name}.irn = %(irn)s RETURNING modified
-        """.format(
-            table_name=self.table,
-            insert_fields=','.join(insert_fields),
-            insert_fields_placeholders=','.join(map(lambda field: "%({0})s".format(field), insert_fields)),
-            update_fields=','.join(update_fields),
-            update_fields_placeholders=','.join(map(lambda field: "%({0})s".format(field), update_fields)),
+            DO UPDATE SET ({update_fields}, modified) = ({update_fields_excluded}, NOW())
+        """).format(
+            table_name=sql.Identifier(self.table),
+            staging_table=sql.Identifier(self.staging_table),
+            insert_fields=insert_fields,
+            update_fields=sql.SQL(',').join(map(sql.Identifier, update_fields)),
+            update_fields_excluded=sql.SQL(',').join(
+                sql.SQL('EXCLUDED.{}').format(sql.Identifier(field)) for field in update_fields
+            ),
+        )
+        return query
+
+    @property
+    def sql_returning_inserted(self):
+        """
+        SQL for insert / updates from the staging table, which also records
+        the IRNs of all the newly inserted records (with no modified date) in
+        the inserted table, for the milestone checks
+        :return: SQL
+        """
+        query = sql.SQL("""
+            WITH upserted AS ({upsert_sql} RETURNING irn, modified)
+            INSERT INTO {inserted_table} (irn) SELECT irn FROM upserted WHERE modified IS NULL
+        """).format(
+            upsert_sql=self.sql,
+            inserted_table=sql.Identifier(self.inserted_table)
+        )
+        return query
+
+    def create_inserted_table(self, connection):
+        """
+        Create a temporary table for the IRNs of newly inserted records
+        """
+        query = sql.SQL("CREATE TEMPORARY TABLE {inserted_table} (irn INTEGER) ON COMMIT DROP").format(
+            inserted_table=sql.Identifier(self.inserted_table)
         )
-        return sql
+        connection.cursor().execute(query)
+
+    def check_milestones(self, connection):
+        """
+        Check all the newly inserted records against the milestones, in IRN
+        order. Records are read through a server side cursor, so a full import
+        is never held in memory
+        """
+        query = sql.SQL("""
+            SELECT {returned_fields} FROM {table_name} JOIN {inserted_table} USING (irn) ORDER BY irn
+        """).format(
+            returned_fields=self.returned_fields,
+            table_name=sql.Identifier(self.table),
+            inserted_table=sql.Identifier(self.inserted_table)
+        )
+        insert_fields = self.insert_fields
+        cursor = connection.cursor(name='{}_milestones'.format(self.table))
+        cursor.itersize = MILESTONE_ITERSIZE
+        try:
+            cursor.execute(query)
+            for row in cursor:
+                record_dict = dict(zip(insert_fields, row))
+                record_dict['properties'] = PGJson(record_dict['properties'])
+                self.milestone_check(record_dict)
+        finally:
+            cursor.close()
+
+    def create_staging_table(self, connection):
+        """
+        Create a temporary table with the same structure as the module
+        table, plus an integer array column for each of the foreign keys
+        """
+        coldefs = [sql.SQL('LIKE {table}').format(table=sql.Identifier(self.table))]
+        coldefs += [
+            sql.SQL('{name} INTEGER[]').format(name=sql.Identifier(fk.staging_column)) for fk in self.foreign_keys
+        ]
+        query = sql.SQL("CREATE TEMPORARY TABLE {staging_table} ({coldefs}) ON COMMIT DROP").format(
+            staging_table=sql.Identifier(self.staging_table),
+            coldefs=sql.SQL(',').join(coldefs)
+        )
+        connection.cursor().execute(query)
+
+    def copy_records(self, connection):
+        """
+        Stream all the records into the staging table with COPY FROM STDIN
+        Records are formatted as they are read by copy_expert, so the export
+        is never held in memory. The export is parsed in a background thread
+        so reading the file overlaps with sending data to postgres
+        """
+        insert_fields = self.insert_fields
+        copy_fields = insert_fields + [fk.staging_column for fk in self.foreign_keys]
+
+        def rows():
+            for record in self.records():
+                self.insert_count += 1
+                record_dict = self._record_to_dict(record)
+                row = [record_dict[f] for f in insert_fields]
+                row += [fk.get_rel_irns(record) for fk in self.foreign_keys]
+                yield row
+
+        query = sql.SQL("COPY {staging_table} ({copy_fields}) FROM STDIN WITH (FORMAT TEXT)").format(
+            staging_table=sql.Identifier(self.staging_table),
+            copy_fields=sql.SQL(',').join(map(sql.Identifier, copy_fields))
+        )
+        cursor = connection.cursor()
+        # copy_expert only accepts a string
+        query = query.as_string(connection)
+        background_rows = BackgroundIterator(rows())
+        try:
+            cursor.copy_expert(query, CopyStream(background_rows), size=COPY_BUFFER_SIZE)
+        finally:
+            # If the COPY fails, stop parsing the export in the background
+            background_rows.stop()
 
     def requires(self):
         return KeemuFileTask(
@@ -149,8 +380,7 @@ class KeemuBaseTask(LuigiCopyToTable):
         )
 
     def ensure_table(self):
-        connection = self.output().connect()
-        if not db_table_exists(self.table, connection):
+        if not db_table_exists(self.table, self.connection):
             self.create_table(self.connection)
         # Create any foreign key tables
         if self.foreign_keys:
@@ -163,8 +393,8 @@ class KeemuBaseTask(LuigiCopyToTable):
         Return True if it can be; return False if it should be skipped
         @return: boolean
         """
-        for record_filter in self.record_filters:
-            if not record_filter.apply(record):
+        for field_name, filter_operator, filter_value in self._filter_chain:
+            if not filter_operator(getattr(record, field_name, None), filter_value):
                 return False
         return True
 
@@ -177,49 +407,64 @@ class KeemuBaseTask(LuigiCopyToTable):
             m.check(record_dict)
 
     def run(self):
+        # Initiate a DB connection
+        self.connection = self.output().connect()
+        self.cursor = self.connection.cursor()
+        # Get current specimen record count
+        self.milestones = get_milestones(self.cursor, self.module_name)
         # Ensure table exists
         self.ensure_table()
         start_time = time.time()
 
-        for record in self.records():
-            self.insert_count += 1
-            record_dict = self._record_to_dict(record)
-
-            # Cast all dict objects to PGJson
-            for key in record_dict.keys():
-                if type(record_dict[key]) is dict:
-                    record_dict[key] = PGJson(record_dict[key])
-
-            # Insert the record
-            self.cursor.execute(self.sql, record_dict)
-            # The SQL upsert statement uses INSERT ON CONFLICT UPDATE...
-            # Which always returns INSERT 1 in status message
-            # So the UPDATE statement uses RETURNING modified
-            # If we have a modified date, this is an update; otherwise an insert
-            is_update = self.cursor.fetchone()[0] is not None
-
-            if not is_update:
-                self.milestone_check(record_dict)
+        self.create_staging_table(self.connection)
+        self.copy_records(self.connection)
+        # Temporary tables aren't analyzed automatically
+        self.cursor.execute(sql.SQL('ANALYZE {}').format(sql.Identifier(self.staging_table)))
+
+        # Building an index from scratch is much faster than updating it for
+        # every row, but only worth it if a large part of the table is being
+        # written - e.g. for a full export, but not the daily updates. The
+        # indexes are dropped and rebuilt in the import transaction, so the
+        # table is never served without them, and a failed import restores
+        # them - but readers are blocked until the import is committed
+        rebuild_indexes = (
+            self.insert_count > db_table_estimated_count(self.table, self.connection) * self.rebuild_indexes_ratio
+        )
+        if rebuild_indexes:
+            self.drop_indexes(self.connection)
+
+        # Records are filtered out while the COPY is in progress, so deleting
+        # records marked as not web publishable has to wait until it completes
+        if self.unpublished_irns:
+            db_delete_records(self.table, self.unpublished_irns, self.cursor)
+
+        # Upsert the staged records - if there are milestones for this module,
+        # the newly inserted records are checked against them
+        if self.milestones:
+            self.create_inserted_table(self.connection)
+            self.cursor.execute(self.sql_returning_inserted)
+            self.check_milestones(self.connection)
+        else:
+            self.cursor.execute(self.sql)
+
+        # If we have foreign keys for this module, delete all the existing
+        # relations for the staged records and reinsert them. Foreign keys
+        # sharing a table are deleted once, so they don't remove each other's
+        for foreign_keys in self._foreign_key_tables.values():
+            foreign_keys[0].delete(self.cursor, self.staging_table)
+            for fk in foreign_keys:
+                fk.insert(self.cursor, self.staging_table)
+
+        if rebuild_indexes:
+            self.create_indexes(self.connection)
 
-            # If we have foreign keys for this module, see if a foreign key
-            # has been defined - and if it has insert it
-            if self.foreign_keys:
-                for fk in self.foreign_keys:
-                    # If this is an update (has modified date), delete all
-                    # foreign key relations before reinserting
-                    # Prevents relationships data from getting stale
-                    if is_update:
-                        fk.delete(self.cursor, record)
-                    # If this record has a relationship, insert it
-                    rel_irn = getattr(record, fk.field_name, None)
-                    if rel_irn:
-                        fk.insert(self.cursor, record, rel_irn)
-
-        # mark as complete in same transaction
-        self.output().touch(self.connection)
-        # Create indexes now - slightly speeds up the process if it happens afterwards
+        self.connection.commit()
+        # Create any other missing indexes - e.g. on a newly indexed column
         self.ensure_indexes()
-        # And commit everything
+        # Update the planner statistics for the new data
+        self.cursor.execute(sql.SQL('ANALYZE {}').format(sql.Identifier(self.table)))
+        # And mark as complete once the indexes have been built
+        self.output().touch(self.connection)
         self.connection.commit()
         logger.info('Inserted %d %s records in %d seconds', self.insert_count, self.table, time.time() - start_time)
 
@@ -232,36 +477,117 @@ class KeemuBaseTask(LuigiCopyToTable):
         return self.input()
 
     def records(self):
-        for record in Parser(self.file_input.path):
-            # Iterate record counter, even if it gets filtered out
-            # makes debugging a bit simpler, as you can limit and test filters
-            self.record_count += 1
-            if self._apply_filters(record):
-                yield record
-            # Record is being filtered out
-            # Before we continue, if the record has been marked as
-            #  not web publishable, we try and delete it
-            elif not self._is_web_publishable(record):
-                self.delete_record(record)
-
-            if self.limit and self.record_count >= self.limit:
-                break
+        apply_filters = self._apply_filters
+        is_web_publishable = self._is_web_publishable
+        # Log the record count every 1000 records, if debug logging is enabled
+        log_progress = logger.isEnabledFor(logging.DEBUG)
+        next_log = 1000
+        parser = Parser(self.file_input.path, self._record_field_names)
+        try:
+            for record in parser:
+                # Iterate record counter, even if it gets filtered out
+                # makes debugging a bit simpler, as you can limit and test filters
+                self.record_count += 1
+                if apply_filters(record):
+                    yield record
+                # Record is being filtered out
+                # Before we continue, if the record has been marked as
+                #  not web publishable, we queue it for deletion
+                elif not is_web_publishable(record):
+                    self.unpublished_irns.append(record.irn)
+
+                if self.limit and self.record_count >= self.limit:
+                    break
+
+                if log_progress and self.record_count == next_log:
+                    logger.debug('Record count: %d', self.record_count)
+                    next_log += 1000
+        finally:
+            # Close the export file, even if we stop early because of the limit
+            parser.close()
+
+    def drop_indexes(self, connection):
+        """
+        Drop the field indexes on the module table, so the upsert doesn't have
+        to maintain them. The primary key is kept, as it's needed for the upsert.
+        They are recreated by create_indexes(), in the same transaction
+        """
+        cursor = connection.cursor()
+        existing_index_names = db_get_index_names(self.table, connection)
+        for field_name, _ in self._indexes:
+            index_name = db_index_name(self.table, field_name)
+            if index_name in existing_index_names:
+                cursor.execute(sql.SQL('DROP INDEX {}').format(sql.Identifier(index_name)))
+
+    def create_indexes(self, connection):
+        """
+        Create all the missing indexes on the connection - used to rebuild the
+        indexes dropped by drop_indexes() before the import is committed, so
+        the table is never visible without them
+        """
+        self._set_index_build_settings(connection)
+        for field_name, index_type in self._get_missing_indexes(connection):
+            db_create_index(self.table, field_name, index_type, connection)
 
-            if self.record_count % 1000 == 0:
-                logger.debug('Record count: %d', self.record_count)
+    def ensure_indexes(self):
+        """
+        Create any missing indexes in parallel - each index is created on its own
+        connection, so postgres builds them at the same time in separate backends
+        Usually there's nothing to build, and no connections are opened
+        """
+        missing_indexes = self._get_missing_indexes(self.connection)
+        if not missing_indexes:
+            return
+        max_workers = min(len(missing_indexes), self.index_workers)
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # Consume the results so any errors are raised here
+                list(executor.map(lambda index: self._create_index(*index), missing_indexes))
+        finally:
+            missing_indexes = self._get_missing_indexes(self.connection)
+            if missing_indexes:
+                logger.warning(
+                    'Table %s is missing indexes on: %s',
+                    self.table,
+                    ', '.join(field_name for field_name, _ in missing_indexes)
+                )
+
+    def _get_missing_indexes(self, connection):
+        """
+        Get the (field name, index type) of the indexes which don't exist yet
+        :param connection:
+        :return: list
+        """
+        existing_index_names = db_get_index_names(self.table, connection)
+        return [
+            (field_name, index_type) for field_name, index_type in self._indexes
+            if db_index_name(self.table, field_name) not in existing_index_names
+        ]
 
-    def delete_record(self, record):
+    def _set_index_build_settings(self, connection):
         """
-        Mark a record as deleted
-        :return: None
+        Set the memory and parallel workers for building indexes, for the
+        rest of the current transaction
         """
-        db_delete_record(self.table, record.irn, self.cursor)
+        cursor = connection.cursor()
+        cursor.execute('SET LOCAL maintenance_work_mem = %s', (self.maintenance_work_mem,))
+        # Parallel index builds were added in postgres 11
+        if connection.server_version >= 110000:
+            cursor.execute('SET LOCAL max_parallel_maintenance_workers = %s', (self.max_parallel_maintenance_workers,))
 
-    def ensure_indexes(self):
-        for column in self.columns:
-            if column.indexed:
-                index_type = column.get_index_type()
-                db_create_index(self.table, column.field_name, index_type, self.connection)
+    def _create_index(self, field_name, index_type):
+        """
+        Create an index on a new connection
+        :param field_name:
+        :param index_type:
+        """
+        connection = self.output().connect()
+        try:
+            self._set_index_build_settings(connection)
+            db_create_index(self.table, field_name, index_type, connection)
+            connection.commit()
+        finally:
+            connection.close()
 
     @staticmethod
     def _is_web_publishable(record):
@@ -272,7 +598,9 @@ class KeemuBaseTask(LuigiCopyToTable):
         :param record:
         :return: boolean - false if not importable
         """
-        return record.AdmPublishWebNoPasswordFlag.lower() != 'n'
+        # Compare against both cases rather than lower casing the flag, which
+        # would create a new string for every record
+        return record.AdmPublishWebNoPasswordFlag not in ('n', 'N')
 
     def _record_to_dict(self, record):
         """
@@ -294,7 +622,7 @@ class KeemuBaseTask(LuigiCopyToTable):
         return {
             'irn': record.irn,
             'guid': record.AdmGUIDPreferredValue,
-            'properties': self._record_map_fields(record, self.record_properties),
+            'properties': self._record_to_properties(record),
             'import_date': int(self.date)
         }
 
@@ -305,33 +633,33 @@ class KeemuBaseTask(LuigiCopyToTable):
         :return:
         """
         column_dict = {}
+        values = self._column_values(record)
         # Loop through columns, adding any extra fields
         # These need to be set even if null as they are part of the SQL statement
-        for column in self.columns:
-            if column.ke_field_name:
-                value = None
-                # Ke field name can be a list - if it is loop through all the values
-                if isinstance(column.ke_field_name, list):
-                    for fn in column.ke_field_name:
-                        value = getattr(record, fn, None)
-                        # Once we have a value, break out of the loop
-                        if value:
-                            break
-                else:
-                    value = getattr(record, column.ke_field_name, None)
-
-                column_dict[column.field_name] = column.formatter(value)
+        for field_name, start, end, formatter in self._column_getters:
+            value = None
+            # Loop through the values for all the ke field names
+            for value in values[start:end]:
+                # Once we have a value, break out of the loop
+                if value:
+                    break
+            column_dict[field_name] = formatter(value)
 
         return column_dict
 
-    @staticmethod
-    def _record_map_fields(record, fields):
+    def _record_to_properties(self, record):
         """
-        Helper function - pass in a list of tuples
-        (source field, destination field)
-        And return a dict of values keyed by destination field
+        Build a dict of the record's property values keyed by field alias
+        Properties without a value are not included
         :param record:
-        :param fields:
         :return:
         """
-        return {f.field_alias: f.get_value(record) for f in fields if f.has_value(record)}
+        properties = {}
+        values = self._property_values(record)
+        for field, start, end in self._property_getters:
+            # Use the first value set for any of the field's KE EMu fields
+            for value in values[start:end]:
+                if value:
+                    properties[field.field_alias] = field.format_value(value)
+                    break
+        return properties
@@ -38,7 +38,7 @@ class ETaxonomyTask(KeemuBaseTask):
             'irn': record.irn,
             # get the guid or None
             'guid': getattr(record, 'AdmGUIDPreferredValue', None),
-            'properties': self._record_map_fields(record, self.record_properties),
+            'properties': self._record_to_properties(record),
             'import_date': int(self.date)
         }
 
@@ -47,5 +47,15 @@ class TestImport(BaseTestCase):
         # (Derived from the taxonomy record)
         self.assertEqual(record['properties'].get('scientificName'), 'Certhia americana')
 
+    def test_repeated_record_uses_last_copy_in_export(self):
+        # irn 21 appears twice in the export - the last copy should be imported
+        record = self._get_record('ecatalogue', irn=21)
+        self.assertEqual(record['properties'].get('modified'), '2017-01-02')
+
+    def test_repeated_record_only_has_relations_from_last_copy_in_export(self):
+        self.cursor.execute('SELECT rel_irn FROM _ecatalogue__emultimedia WHERE irn = %s', (21,))
+        self.assertEqual([row[0] for row in self.cursor.fetchall()], [4])
+
+
 if __name__ == '__main__':
     unittest.main()
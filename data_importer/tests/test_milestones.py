@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from psycopg2 import sql
+
+from data_importer.lib.stats import BaseMilestone, SpecimenMilestone
+from data_importer.tasks.keemu.ecatalogue import EcatalogueTask
+
+
+class FixedDatetime(datetime):
+    """
+    Datetime with now() fixed between the embargo dates used in the tests
+    """
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2019, 1, 1)
+
+
+class TestMilestones(unittest.TestCase):
+    """
+    Tests for the records passed to the milestone checks
+    """
+    def setUp(self):
+        # Skip the database record count, and config lookup
+        with mock.patch.object(BaseMilestone, '__init__', return_value=None):
+            self.milestone = SpecimenMilestone(None)
+
+    def _record_dict(self, **kwargs):
+        record_dict = {'irn': 13, 'record_type': self.milestone.record_types[0]}
+        record_dict.update(kwargs)
+        return record_dict
+
+    def test_embargo_date_is_returned_in_export_format(self):
+        # Milestones parse the embargo date as YYYYMMDD, the same as the export
+        returned_field = sql.SQL("to_char({0}, 'YYYYMMDD') AS {0}").format(sql.Identifier('embargo_date'))
+        self.assertIn(returned_field, EcatalogueTask._returned_fields)
+
+    def test_specimen_matches_specimen_milestone(self):
+        self.assertTrue(self.milestone.match(self._record_dict()))
+
+    def test_embargoed_specimen_does_not_match_specimen_milestone(self):
+        with mock.patch('data_importer.lib.stats.dt', FixedDatetime):
+            self.assertFalse(self.milestone.match(self._record_dict(embargo_date='20200101')))
+
+    def test_expired_embargoed_specimen_matches_specimen_milestone(self):
+        with mock.patch('data_importer.lib.stats.dt', FixedDatetime):
+            self.assertTrue(self.milestone.match(self._record_dict(embargo_date='20150101')))
+
+    def test_other_record_type_does_not_match_specimen_milestone(self):
+        self.assertFalse(self.milestone.match(self._record_dict(record_type='Index Lot')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from data_importer.lib.parser import Parser
+from data_importer.lib.record import Record, SlotsRecord
+
+EXPORT = """irn:1=1
+AdmGUIDPreferredValue:1=GUID1
+AdmPublishWebNoPasswordFlag:1=Y
+ColRecordType:1=Specimen
+MulMultiMediaRef:1=1
+MulMultiMediaRef:2=2
+MulMultiMediaRef:3=3
+###
+irn:1=2
+AdmGUIDPreferredValue:1=GUID2
+ColRecordType:1=Artefact
+###
+"""
+
+
+class TestParser(unittest.TestCase):
+    """
+    Tests for parsing a KE EMu export file into records
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'ecatalogue.export.20170101.gz')
+        with gzip.open(self.path, 'wt') as f:
+            f.write(EXPORT)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_all_records_are_parsed(self):
+        self.assertEqual([record.irn for record in Parser(self.path)], ['1', '2'])
+
+    def test_all_fields_are_parsed_without_field_names(self):
+        record = next(Parser(self.path))
+        self.assertIsInstance(record, Record)
+        self.assertEqual(record.ColRecordType, 'Specimen')
+        self.assertEqual(record.AdmPublishWebNoPasswordFlag, 'Y')
+
+    def test_fields_not_in_field_names_are_skipped(self):
+        record = next(Parser(self.path, ['irn', 'AdmGUIDPreferredValue']))
+        self.assertIsInstance(record, SlotsRecord)
+        self.assertEqual(record.irn, '1')
+        self.assertEqual(record.AdmGUIDPreferredValue, 'GUID1')
+        self.assertIsNone(record.ColRecordType)
+        self.assertFalse(hasattr(record, '__dict__'))
+
+    def test_multi_value_field_is_list(self):
+        for field_names in [None, ['irn', 'MulMultiMediaRef']]:
+            record = next(Parser(self.path, field_names))
+            self.assertEqual(record.MulMultiMediaRef, ['1', '2', '3'])
+
+    def test_unset_slot_is_none(self):
+        records = list(Parser(self.path, ['irn', 'AdmPublishWebNoPasswordFlag', 'MulMultiMediaRef']))
+        self.assertIsNone(records[1].AdmPublishWebNoPasswordFlag)
+        self.assertIsNone(records[1].MulMultiMediaRef)
+
+    def test_setting_field_not_in_slots_raises_error(self):
+        record = next(Parser(self.path, ['irn']))
+        with self.assertRaises(AttributeError):
+            record.ColRecordType = 'Specimen'
+
+    def test_file_is_closed_after_parsing(self):
+        parser = Parser(self.path, ['irn'])
+        list(parser)
+        self.assertTrue(parser.export_file.closed)
+
+    def test_close(self):
+        parser = Parser(self.path, ['irn'])
+        next(parser)
+        parser.close()
+        self.assertTrue(parser.export_file.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
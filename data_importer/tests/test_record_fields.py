@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import unittest
+
+from data_importer.tasks.keemu.ecatalogue import EcatalogueTask
+from data_importer.tasks.keemu.emultimedia import EMultimediaTask
+from data_importer.tasks.keemu.etaxonomy import ETaxonomyTask
+
+
+class TestRecordFields(unittest.TestCase):
+    """
+    The parser only reads the fields in a task's _record_field_names, so every
+    field used by a task's filters, columns, properties and foreign keys must
+    be in it - or it will silently be None
+    """
+    task_classes = [EcatalogueTask, EMultimediaTask, ETaxonomyTask]
+
+    @staticmethod
+    def _get_used_field_names(task):
+        field_names = {'irn', 'AdmGUIDPreferredValue'}
+        for record_filter in task.record_filters:
+            field_names.add(record_filter.field_name)
+        for column in task.columns:
+            if column.ke_field_name:
+                if isinstance(column.ke_field_name, list):
+                    field_names.update(column.ke_field_name)
+                else:
+                    field_names.add(column.ke_field_name)
+        for field in task.record_properties:
+            field_names.update(field.field_name)
+        for fk in task.foreign_keys:
+            field_names.add(fk.field_name)
+        return field_names
+
+    def test_all_used_fields_are_parsed(self):
+        for task_class in self.task_classes:
+            task = task_class(date=20170101)
+            with self.subTest(module=task.module_name):
+                missing = self._get_used_field_names(task) - task._record_field_names
+                self.assertFalse(missing, 'Fields not parsed: {}'.format(', '.join(sorted(missing))))
+
+    def test_record_properties_are_parsed(self):
+        # Make sure the properties have been picked up from the datasets
+        for task_class in self.task_classes:
+            task = task_class(date=20170101)
+            with self.subTest(module=task.module_name):
+                self.assertTrue(task.record_properties)
+
+    def test_foreign_key_staging_columns_are_unique(self):
+        for task_class in self.task_classes:
+            task = task_class(date=20170101)
+            with self.subTest(module=task.module_name):
+                staging_columns = [fk.staging_column.lower() for fk in task.foreign_keys]
+                self.assertEqual(len(staging_columns), len(set(staging_columns)))
+                self.assertFalse(set(staging_columns) & set(task.insert_fields))
+
+    def test_foreign_keys_sharing_a_table_are_grouped(self):
+        task = EcatalogueTask(date=20170101)
+        field_names = {fk.field_name for fk in task._foreign_key_tables['_ecatalogue__etaxonomy']}
+        self.assertEqual(field_names, {'CardParasiteRef', 'EntIndIndexLotTaxonNameLocalRef'})
+
+
+if __name__ == '__main__':
+    unittest.main()
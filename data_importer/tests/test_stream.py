@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import json
+import unittest
+
+from data_importer.lib.stream import (
+    BackgroundIterator,
+    CopyStream,
+    copy_format_array,
+    copy_format_row,
+    copy_format_value
+)
+
+
+class TestCopyFormat(unittest.TestCase):
+    """
+    Tests for formatting values in the Postgres COPY TEXT format
+    """
+    def test_none_is_null(self):
+        self.assertEqual(copy_format_value(None), b'\\N')
+
+    def test_string_is_utf8_encoded(self):
+        self.assertEqual(copy_format_value('Bufo bufo – é'), 'Bufo bufo – é'.encode('utf-8'))
+
+    def test_integer_is_formatted_as_string(self):
+        self.assertEqual(copy_format_value(20170101), b'20170101')
+
+    def test_booleans(self):
+        self.assertEqual(copy_format_value(True), b't')
+        self.assertEqual(copy_format_value(False), b'f')
+
+    def test_tab_is_escaped(self):
+        self.assertEqual(copy_format_value('a\tb'), b'a\\tb')
+
+    def test_newlines_are_escaped(self):
+        self.assertEqual(copy_format_value('a\nb\rc'), b'a\\nb\\rc')
+
+    def test_backslash_is_escaped(self):
+        self.assertEqual(copy_format_value('a\\b'), b'a\\\\b')
+
+    def test_null_marker_string_is_not_null(self):
+        # A literal \N in the data must not be read as NULL
+        self.assertEqual(copy_format_value('\\N'), b'\\\\N')
+
+    def test_dict_is_json_with_backslashes_escaped(self):
+        value = {'title': 'a "quoted"\ttitle\nwith \\ backslash'}
+        formatted = copy_format_value(value)
+        # No raw tabs or newlines which would break the COPY row
+        self.assertNotIn(b'\t', formatted)
+        self.assertNotIn(b'\n', formatted)
+        # Un-escaping the COPY backslashes gives valid JSON for the dict
+        self.assertEqual(json.loads(formatted.replace(b'\\\\', b'\\').decode('utf-8')), value)
+
+    def test_list_is_array_literal(self):
+        self.assertEqual(copy_format_array(['1', '2']), '{"1","2"}')
+
+    def test_array_elements_are_quoted_and_escaped(self):
+        self.assertEqual(copy_format_array(['a"b', 'c\\d', None]), '{"a\\"b","c\\\\d",NULL}')
+
+    def test_list_value_is_copy_escaped(self):
+        # The array literal backslashes need escaping again for COPY
+        self.assertEqual(copy_format_value(['a"b', 'c\td']), b'{"a\\\\"b","c\\td"}')
+
+    def test_integer_list(self):
+        self.assertEqual(copy_format_value([1, 100]), b'{"1","100"}')
+
+    def test_row_is_tab_separated_and_newline_terminated(self):
+        self.assertEqual(copy_format_row([1, None, 'a\tb']), b'1\t\\N\ta\\tb\n')
+
+
+class TestCopyStream(unittest.TestCase):
+    """
+    Tests for the file-like object read by copy_expert
+    """
+    rows = [
+        [1, 'GUID1', {'title': 'a\tb'}, 20170101],
+        [2, None, {'title': 'c\\d'}, 20170101],
+        [2, 'GUID2', {}, 20170102],
+    ]
+
+    def _expected(self):
+        return b''.join(copy_format_row(row) for row in self.rows)
+
+    def test_read_all(self):
+        self.assertEqual(CopyStream(iter(self.rows)).read(), self._expected())
+
+    def test_read_in_chunks(self):
+        stream = CopyStream(iter(self.rows))
+        chunks = []
+        while True:
+            chunk = stream.read(7)
+            if not chunk:
+                break
+            self.assertLessEqual(len(chunk), 7)
+            chunks.append(chunk)
+        self.assertEqual(b''.join(chunks), self._expected())
+
+    def test_rows_are_read_lazily(self):
+        consumed = []
+
+        def rows():
+            for row in self.rows:
+                consumed.append(row)
+                yield row
+
+        stream = CopyStream(rows())
+        stream.read(1)
+        self.assertEqual(len(consumed), 1)
+
+    def test_empty(self):
+        self.assertEqual(CopyStream(iter([])).read(8192), b'')
+
+
+class TestBackgroundIterator(unittest.TestCase):
+    """
+    Tests for consuming an iterator in a background thread
+    """
+    def test_items_are_returned_in_order(self):
+        items = list(range(1050))
+        self.assertEqual(list(BackgroundIterator(iter(items), batch_size=100, maxsize=2)), items)
+
+    def test_empty(self):
+        self.assertEqual(list(BackgroundIterator(iter([]))), [])
+
+    def test_next_after_end_raises_stop_iteration(self):
+        iterator = BackgroundIterator(iter([1]))
+        self.assertEqual(list(iterator), [1])
+        with self.assertRaises(StopIteration):
+            next(iterator)
+
+    def test_error_is_only_raised_once(self):
+        def items():
+            raise ValueError('Parse error')
+            yield
+
+        iterator = BackgroundIterator(items())
+        with self.assertRaises(ValueError):
+            next(iterator)
+        with self.assertRaises(StopIteration):
+            next(iterator)
+
+    def test_copy_stream_read_until_empty(self):
+        # copy_expert calls read() until it returns no data
+        rows = [[i, 'GUID{}'.format(i), {'title': 'a\tb'}, 20170101] for i in range(1000)]
+        stream = CopyStream(BackgroundIterator(iter(rows), batch_size=100, maxsize=2))
+        chunks = []
+        while True:
+            chunk = stream.read(4096)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        self.assertEqual(b''.join(chunks), b''.join(copy_format_row(row) for row in rows))
+        self.assertEqual(stream.read(4096), b'')
+
+    def test_error_is_raised_in_consumer(self):
+        def items():
+            yield 1
+            raise ValueError('Parse error')
+
+        with self.assertRaises(ValueError):
+            list(BackgroundIterator(items()))
+
+    def test_stop_closes_source(self):
+        closed = []
+
+        def items():
+            try:
+                i = 0
+                while True:
+                    yield i
+                    i += 1
+            finally:
+                closed.append(True)
+
+        iterator = BackgroundIterator(items(), batch_size=10, maxsize=1)
+        self.assertEqual(next(iterator), 0)
+        iterator.stop()
+        self.assertFalse(iterator.thread.is_alive())
+        self.assertEqual(closed, [True])
+
+
+if __name__ == '__main__':
+    unittest.main()